@@ -6,12 +6,59 @@ Uploads designs to GitHub Releases or ImgBB for permanent storage
 
 import os
 import json
+import random
+import tempfile
+import time
+import zipfile
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 from typing import List, Optional
 
 
+# Max parallel release-asset uploads (kept low to avoid GitHub's secondary rate limits)
+UPLOAD_CONCURRENCY = int(os.environ.get('TRENDMERCH_UPLOAD_CONCURRENCY', '8'))
+
+# Retry policy for transient 429/5xx responses
+UPLOAD_ATTEMPTS = 5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Shared HTTP session so connections to GitHub/ImgBB are pooled and kept alive.
+# Retry covers connection errors; status-based retries only apply to
+# idempotent methods, so asset POSTs are retried in _upload_asset instead.
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=1, status_forcelist=RETRY_STATUSES),
+))
+
+# Block size used when streaming asset bodies from disk
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class _FileChunks:
+    """
+    Streams a file in fixed-size blocks as a request body.
+    Exposes __len__ so requests still sends a Content-Length header.
+    """
+    
+    def __init__(self, path: str, chunk_size: int = UPLOAD_CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+    
+    def __len__(self) -> int:
+        return os.path.getsize(self.path)
+    
+    def __iter__(self):
+        with open(self.path, 'rb') as f:
+            while chunk := f.read(self.chunk_size):
+                yield chunk
+
+
 def upload_to_imgbb(image_path: str, api_key: str = None) -> Optional[dict]:
     """
     Upload image to ImgBB (free image hosting).
@@ -25,18 +72,15 @@ def upload_to_imgbb(image_path: str, api_key: str = None) -> Optional[dict]:
     
     url = "https://api.imgbb.com/1/upload"
     
-    with open(image_path, 'rb') as f:
-        import base64
-        image_data = base64.b64encode(f.read()).decode('utf-8')
-    
     payload = {
         'key': api_key,
-        'image': image_data,
         'name': Path(image_path).stem,
     }
     
     try:
-        response = requests.post(url, data=payload, timeout=60)
+        # Send raw bytes as multipart form data (no base64 overhead)
+        with open(image_path, 'rb') as f:
+            response = _SESSION.post(url, data=payload, files={'image': f}, timeout=60)
         response.raise_for_status()
         data = response.json()
         
@@ -53,13 +97,72 @@ def upload_to_imgbb(image_path: str, api_key: str = None) -> Optional[dict]:
     return None
 
 
+def _retry_delay(response: requests.Response, attempt: int) -> float:
+    """Seconds to wait before retrying: Retry-After if given, else backoff with jitter."""
+    retry_after = response.headers.get('Retry-After')
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+    return min(60, (2 ** attempt) + random.uniform(0, 1))
+
+
+def _upload_asset(upload_url: str, headers: dict, file_path: str) -> Optional[dict]:
+    """Upload a single file as a release asset."""
+    filename = os.path.basename(file_path)
+    
+    upload_headers = headers.copy()
+    upload_headers['Content-Type'] = 'application/octet-stream'
+    
+    for attempt in range(UPLOAD_ATTEMPTS):
+        try:
+            file_response = _SESSION.post(
+                f"{upload_url}?name={filename}",
+                headers=upload_headers,
+                data=_FileChunks(file_path),
+                timeout=120
+            )
+        except Exception as e:
+            print(f"   ❌ Failed: {filename} ({e})")
+            return None
+        
+        if file_response.status_code not in RETRY_STATUSES or attempt == UPLOAD_ATTEMPTS - 1:
+            break
+        
+        wait_time = _retry_delay(file_response, attempt)
+        print(f"   ⚠️ {filename}: HTTP {file_response.status_code}. Retrying in {wait_time:.1f}s...")
+        time.sleep(wait_time)
+    
+    if file_response.status_code in [200, 201]:
+        asset = file_response.json()
+        print(f"   ✅ Uploaded: {filename}")
+        return {
+            'name': filename,
+            'url': asset['browser_download_url'],
+            'size': asset['size']
+        }
+    
+    print(f"   ❌ Failed: {filename}")
+    return None
+
+
+def _bundle_files(paths: List[str], archive_path: str) -> str:
+    """Pack files into a single zip (stored, PNGs are already compressed)."""
+    with zipfile.ZipFile(archive_path, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for path in paths:
+            zf.write(path, arcname=os.path.basename(path))
+    return archive_path
+
+
 def create_github_release(
     repo: str,
     tag: str,
     files: List[str],
     token: str = None,
     title: str = None,
-    body: str = None
+    body: str = None,
+    bundle: Optional[bool] = None
 ) -> Optional[dict]:
     """
     Create a GitHub release and upload files.
@@ -71,6 +174,8 @@ def create_github_release(
         token: GitHub token (or use GITHUB_TOKEN env var)
         title: Release title
         body: Release description
+        bundle: Upload one zip instead of one asset per file
+                (default: TRENDMERCH_BUNDLE=1 env var)
     """
     token = token or os.environ.get('GITHUB_TOKEN')
     
@@ -83,19 +188,36 @@ def create_github_release(
         'Accept': 'application/vnd.github.v3+json',
     }
     
+    if bundle is None:
+        bundle = os.environ.get('TRENDMERCH_BUNDLE') == '1'
+    
+    # Drop missing and empty files up front (rembg can leave empty files on failure)
+    paths = [p for p in files if os.path.isfile(p) and os.path.getsize(p) > 0]
+    skipped = [p for p in files if p not in paths]
+    for path in skipped:
+        print(f"   ⚠️ Skipping missing or empty file: {path}")
+    
+    if not paths:
+        print("⚠️ No files to upload. Skipping GitHub release.")
+        return None
+    
     # Create release
     api_url = f"https://api.github.com/repos/{repo}/releases"
     
+    body = body or f"Auto-generated T-shirt designs from TrendMerch\n\nGenerated: {datetime.now().isoformat()}"
+    if bundle:
+        body += "\n\nFiles:\n" + "\n".join(f"- {os.path.basename(p)}" for p in paths)
+    
     release_data = {
         'tag_name': tag,
         'name': title or f"Designs - {tag}",
-        'body': body or f"Auto-generated T-shirt designs from TrendMerch\n\nGenerated: {datetime.now().isoformat()}",
+        'body': body,
         'draft': False,
         'prerelease': False,
     }
     
     try:
-        response = requests.post(api_url, headers=headers, json=release_data, timeout=30)
+        response = _SESSION.post(api_url, headers=headers, json=release_data, timeout=30)
         response.raise_for_status()
         release = response.json()
         
@@ -104,40 +226,23 @@ def create_github_release(
         
         print(f"📦 Created release: {release_url}")
         
-        # Upload files
-        uploaded = []
-        for file_path in files:
-            if not os.path.exists(file_path):
-                continue
-                
-            filename = os.path.basename(file_path)
-            
-            upload_headers = headers.copy()
-            upload_headers['Content-Type'] = 'application/octet-stream'
-            
-            with open(file_path, 'rb') as f:
-                file_response = requests.post(
-                    f"{upload_url}?name={filename}",
-                    headers=upload_headers,
-                    data=f,
-                    timeout=120
-                )
-                
-                if file_response.status_code in [200, 201]:
-                    asset = file_response.json()
-                    uploaded.append({
-                        'name': filename,
-                        'url': asset['browser_download_url'],
-                        'size': asset['size']
-                    })
-                    print(f"   ✅ Uploaded: {filename}")
-                else:
-                    print(f"   ❌ Failed: {filename}")
+        if bundle:
+            # Upload a single archive
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                archive = _bundle_files(paths, os.path.join(tmp_dir, f"designs-{tag}.zip"))
+                result = _upload_asset(upload_url, headers, archive)
+                uploaded = [result] if result else []
+        else:
+            # Upload files in parallel
+            with ThreadPoolExecutor(max_workers=max(1, UPLOAD_CONCURRENCY)) as pool:
+                results = pool.map(lambda p: _upload_asset(upload_url, headers, p), paths)
+                uploaded = [r for r in results if r]
         
         return {
             'release_url': release_url,
             'tag': tag,
-            'files': uploaded
+            'files': uploaded,
+            'skipped': skipped
         }
         
     except Exception as e:
@@ -188,6 +293,7 @@ def upload_designs(design_paths: List[str], method: str = "github") -> dict:
         if release:
             results['release'] = release
             results['uploaded'] = release['files']
+            results['failed'] = release['skipped']
         else:
             results['failed'] = design_paths
     
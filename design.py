@@ -7,16 +7,19 @@ Monitors trending topics and generates print-ready designs automatically.
 """
 
 import argparse
+import functools
+import json
 import os
 import re
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from typing import List, Optional, Tuple
 
 from PIL import Image
-from io import BytesIO
 
 # Trend fetching
 try:
@@ -34,7 +37,7 @@ except ImportError:
 
 # Background removal
 try:
-    from rembg import remove
+    from rembg import new_session, remove
     REMBG_AVAILABLE = True
 except ImportError:
     REMBG_AVAILABLE = False
@@ -47,11 +50,25 @@ CACHE_DIR = Path("./cache")
 # HuggingFace settings
 HF_MODEL = "black-forest-labs/FLUX.1-schnell"  # Excellent at text rendering
 HF_TIMEOUT = 120  # Seconds to wait for generation
+HF_MIN_INTERVAL = float(os.getenv("HF_MIN_INTERVAL", "12"))  # Min seconds between generation starts
+HF_CONCURRENCY = int(os.getenv("HF_CONCURRENCY", "3"))  # Max generations in flight
+
+# Background removal (u2netp is ~5x smaller/faster than u2net, fine for T-shirt art)
+REMBG_MODEL = os.getenv("REMBG_MODEL", "u2netp")
+REMBG_PROVIDERS = ["CUDAExecutionProvider", "CoreMLExecutionProvider", "CPUExecutionProvider"]
+
+# Google Trends settings
+TRENDS_CACHE_TTL = 600  # Seconds to reuse cached trends
+TRENDS_TIMEOUT = (5, 10)  # (connect, read) seconds for pytrends requests
 
 # T-Shirt dimensions (Standard POD sizes)
 TSHIRT_WIDTH = 4500   # pixels
 TSHIRT_HEIGHT = 5400  # pixels
 
+# PNG encoding (zlib level; the fast level is used with --fast-save)
+PNG_COMPRESS_LEVEL = 6
+PNG_FAST_COMPRESS_LEVEL = 1
+
 # Design style presets
 STYLE_PRESETS = {
     "vaporwave": "A retro vaporwave t-shirt vector design featuring the text '{trend}' in bold typography, vibrant neon pink and cyan colors, black background, high contrast, 80s aesthetic",
@@ -103,14 +120,40 @@ def check_dependencies():
     return hf_token
 
 
+_SLUG_STRIP = re.compile(r'[^\w\s-]')
+_SLUG_COLLAPSE = re.compile(r'[\s_-]+')
+
+
 def slugify(text: str) -> str:
     """Convert text to URL-safe slug."""
-    text = text.lower()
-    text = re.sub(r'[^\w\s-]', '', text)
-    text = re.sub(r'[\s_-]+', '_', text)
+    text = _SLUG_STRIP.sub('', text.lower())
+    text = _SLUG_COLLAPSE.sub('_', text)
     return text.strip('_')
 
 
+def _load_cached_trends(cache_file: Path) -> Optional[List[dict]]:
+    """Return cached trends if the cache file is fresh enough."""
+    try:
+        if time.time() - cache_file.stat().st_mtime < TRENDS_CACHE_TTL:
+            with open(cache_file, encoding='utf-8') as f:
+                return json.load(f)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _save_cached_trends(cache_file: Path, trends: List[dict]):
+    """Write trends to the cache atomically."""
+    try:
+        cache_file.parent.mkdir(exist_ok=True)
+        tmp_file = cache_file.with_suffix('.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(trends, f)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        print(f"   ⚠️ Could not cache trends: {e}")
+
+
 def get_trending_topics(
     region: str = "US",
     timeframe: str = "now 1-H",
@@ -126,10 +169,18 @@ def get_trending_topics(
     
     Returns:
         List of dicts with 'query' and 'value' keys
+    
+    Results are cached in CACHE_DIR for TRENDS_CACHE_TTL seconds.
     """
     print(f"\n📊 Fetching trending topics ({region}, {timeframe})...")
     
-    pytrends = TrendReq(hl='en-US', tz=360, timeout=(10, 25))
+    cache_file = CACHE_DIR / f"trends_{slugify(region)}_{slugify(timeframe)}_{limit}.json"
+    cached = _load_cached_trends(cache_file)
+    if cached is not None:
+        print("   Using cached trends")
+        return cached
+    
+    pytrends = TrendReq(hl='en-US', tz=360, timeout=TRENDS_TIMEOUT)
     
     try:
         # Get trending searches (real-time)
@@ -141,10 +192,14 @@ def get_trending_topics(
             trending = pytrends.realtime_trending_searches(pn=region)
             if not trending.empty:
                 topics = trending['title'].head(limit).tolist()
-                return [{"query": t, "value": 100 - i*5} for i, t in enumerate(topics)]
+                trends = [{"query": t, "value": 100 - i*5} for i, t in enumerate(topics)]
+                _save_cached_trends(cache_file, trends)
+                return trends
         else:
             topics = trending[0].head(limit).tolist()
-            return [{"query": t, "value": 100 - i*5} for i, t in enumerate(topics)]
+            trends = [{"query": t, "value": 100 - i*5} for i, t in enumerate(topics)]
+            _save_cached_trends(cache_file, trends)
+            return trends
         
     except Exception as e:
         print(f"   ⚠️ Error fetching trends: {e}")
@@ -163,26 +218,40 @@ def get_trending_topics(
     return []
 
 
+# Quality boosters appended to every prompt, pre-joined onto the presets
+_PROMPT_SUFFIX = ", high quality, vector art, print ready, centered composition"
+_STYLE_TEMPLATES = {name: template + _PROMPT_SUFFIX for name, template in STYLE_PRESETS.items()}
+
+
+@functools.lru_cache(maxsize=256)
 def create_prompt(trend: str, style: str = DEFAULT_STYLE) -> str:
     """
     Create an optimized prompt for the AI model.
     """
-    if style in STYLE_PRESETS:
-        prompt = STYLE_PRESETS[style].format(trend=trend)
-    else:
-        # Custom style passed directly
-        prompt = style.format(trend=trend) if '{trend}' in style else f"{style} with text '{trend}'"
-    
-    # Add quality boosters
-    prompt += ", high quality, vector art, print ready, centered composition"
+    template = _STYLE_TEMPLATES.get(style)
+    if template is None and style in STYLE_PRESETS:
+        # Preset registered after import
+        template = STYLE_PRESETS[style] + _PROMPT_SUFFIX
+    if template is not None:
+        return template.format(trend=trend)
     
-    return prompt
+    # Custom style passed directly
+    if '{trend}' in style:
+        return style.format(trend=trend) + _PROMPT_SUFFIX
+    return f"{style} with text '{trend}'" + _PROMPT_SUFFIX
+
+
+@functools.lru_cache(maxsize=4)
+def _get_client(hf_token: Optional[str] = None) -> "InferenceClient":
+    """Return a cached InferenceClient for the given token."""
+    return InferenceClient(token=hf_token) if hf_token else InferenceClient()
 
 
 def generate_design(
     prompt: str,
     hf_token: Optional[str] = None,
-    retries: int = 3
+    retries: int = 3,
+    client: Optional["InferenceClient"] = None
 ) -> Optional[Image.Image]:
     """
     Generate design using HuggingFace Inference API.
@@ -192,8 +261,8 @@ def generate_design(
     print(f"\n🎨 Generating design...")
     print(f"   Prompt: {prompt[:80]}...")
     
-    # Initialize client
-    client = InferenceClient(token=hf_token) if hf_token else InferenceClient()
+    # Reuse the client across designs
+    client = client or _get_client(hf_token)
     
     for attempt in range(retries):
         try:
@@ -232,6 +301,25 @@ def generate_design(
     return None
 
 
+_rembg_session = None
+_rembg_lock = threading.Lock()
+
+
+def _get_rembg_session():
+    """Create the rembg ONNX session once, preferring GPU providers when present."""
+    global _rembg_session
+    with _rembg_lock:
+        if _rembg_session is None:
+            try:
+                import onnxruntime
+                available = set(onnxruntime.get_available_providers())
+                providers = [p for p in REMBG_PROVIDERS if p in available]
+            except ImportError:
+                providers = None
+            _rembg_session = new_session(REMBG_MODEL, providers=providers)
+    return _rembg_session
+
+
 def remove_background(image: Image.Image) -> Image.Image:
     """
     Remove background from image using rembg.
@@ -239,16 +327,8 @@ def remove_background(image: Image.Image) -> Image.Image:
     """
     print("🔧 Removing background...")
     
-    # Convert to bytes for rembg
-    img_bytes = BytesIO()
-    image.save(img_bytes, format='PNG')
-    img_bytes.seek(0)
-    
-    # Remove background
-    result_bytes = remove(img_bytes.read())
-    
-    # Convert back to PIL Image
-    result = Image.open(BytesIO(result_bytes))
+    # rembg accepts PIL images directly (no PNG encode/decode round-trip)
+    result = remove(image, session=_get_rembg_session())
     
     print("✅ Background removed!")
     return result
@@ -261,10 +341,24 @@ def resize_for_print(
 ) -> Image.Image:
     """
     Resize image to print dimensions using high-quality resampling.
-    Maintains aspect ratio and centers on canvas.
+    Crops transparent margins, maintains aspect ratio and centers on canvas.
     """
     print(f"📐 Resizing to {width}x{height} for print...")
     
+    # Work in RGBA so the paste below stays on the RGBA→RGBA fast path
+    if image.mode != 'RGBA':
+        image = image.convert('RGBA')
+    
+    # Crop to the visible subject so only non-transparent pixels get resampled
+    bbox = image.getchannel('A').getbbox()
+    if bbox and bbox != (0, 0, image.width, image.height):
+        image = image.crop(bbox)
+    
+    # Already print-sized
+    if image.size == (width, height):
+        print("✅ Resized for print!")
+        return image
+    
     # Calculate scaling to fit while maintaining aspect ratio
     img_ratio = image.width / image.height
     target_ratio = width / height
@@ -278,8 +372,18 @@ def resize_for_print(
         new_height = height
         new_width = int(height * img_ratio)
     
-    # Resize with high quality
-    resized = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    # LANCZOS for small scale changes; BICUBIC for big upscales (~3x faster,
+    # no visible difference on illustrative prints)
+    scale = max(new_width / image.width, new_height / image.height)
+    resample = Image.Resampling.LANCZOS if scale < 2.0 else Image.Resampling.BICUBIC
+    
+    # Resize (reducing_gap speeds up large downscales)
+    resized = image.resize((new_width, new_height), resample, reducing_gap=3.0)
+    
+    # Aspect ratio already matches the print size: no canvas needed
+    if resized.size == (width, height):
+        print("✅ Resized for print!")
+        return resized
     
     # Create transparent canvas
     canvas = Image.new('RGBA', (width, height), (0, 0, 0, 0))
@@ -288,25 +392,21 @@ def resize_for_print(
     x = (width - new_width) // 2
     y = (height - new_height) // 2
     
-    # Paste (handling transparency)
-    if resized.mode == 'RGBA':
-        canvas.paste(resized, (x, y), resized)
-    else:
-        canvas.paste(resized, (x, y))
+    # Plain copy: the canvas is fully transparent, so no alpha blend is needed
+    canvas.paste(resized, (x, y))
     
     print("✅ Resized for print!")
     return canvas
 
 
-def process_trend(
+def _generate_for_trend(
     trend: str,
     style: str = DEFAULT_STYLE,
-    remove_bg: bool = True,
-    resize: bool = True,
-    hf_token: Optional[str] = None
-) -> Optional[str]:
+    hf_token: Optional[str] = None,
+    client: Optional["InferenceClient"] = None
+) -> Optional[Image.Image]:
     """
-    Full pipeline: Trend → Design → Post-process → Save
+    Trend → Prompt → Raw design (no post-processing).
     """
     print("\n" + "="*60)
     print(f"🎯 Processing trend: {trend}")
@@ -317,13 +417,29 @@ def process_trend(
     prompt = create_prompt(trend, style)
     
     # Generate design
-    image = generate_design(prompt, hf_token)
+    image = generate_design(prompt, hf_token, client=client)
     
     if image is None:
         print("❌ Failed to generate design")
-        return None
     
-    # Post-processing
+    return image
+
+
+def _postprocess(
+    image: Image.Image,
+    trend: str,
+    remove_bg: bool = True,
+    resize: bool = True,
+    fast_save: bool = False,
+    timestamp: Optional[str] = None,
+    index: Optional[int] = None
+) -> str:
+    """
+    Post-process → Save. CPU-bound, safe to run in a worker thread.
+    
+    Saved as {slug}_{timestamp}[_{index:02d}].png; pass a shared timestamp
+    and index for batch runs so names are deterministic and sortable.
+    """
     if remove_bg:
         try:
             image = remove_background(image)
@@ -332,18 +448,17 @@ def process_trend(
             # Continue with original image
     
     if resize:
-        # Convert to RGBA if not already
-        if image.mode != 'RGBA':
-            image = image.convert('RGBA')
         image = resize_for_print(image)
     
     # Save
     slug = slugify(trend)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{slug}_{timestamp}.png"
+    timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+    suffix = f"_{index:02d}" if index is not None else ""
+    filename = f"{slug}_{timestamp}{suffix}.png"
     output_path = OUTPUT_DIR / filename
     
-    image.save(output_path, 'PNG', optimize=True)
+    compress_level = PNG_FAST_COMPRESS_LEVEL if fast_save else PNG_COMPRESS_LEVEL
+    image.save(output_path, 'PNG', optimize=False, compress_level=compress_level)
     
     print(f"\n✅ Design saved: {output_path}")
     print(f"   Size: {image.width}x{image.height}")
@@ -351,14 +466,60 @@ def process_trend(
     return str(output_path)
 
 
+def process_trend(
+    trend: str,
+    style: str = DEFAULT_STYLE,
+    remove_bg: bool = True,
+    resize: bool = True,
+    hf_token: Optional[str] = None,
+    client: Optional["InferenceClient"] = None,
+    fast_save: bool = False
+) -> Optional[str]:
+    """
+    Full pipeline: Trend → Design → Post-process → Save
+    """
+    image = _generate_for_trend(trend, style, hf_token=hf_token, client=client)
+    
+    if image is None:
+        return None
+    
+    return _postprocess(image, trend, remove_bg=remove_bg, resize=resize, fast_save=fast_save)
+
+
+class _StartPacer:
+    """Spaces out call start times by a minimum interval across threads."""
+    
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._next_start = 0.0
+        self._lock = threading.Lock()
+    
+    def wait(self):
+        """Block until this caller's start slot."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.min_interval
+        
+        wait_time = start - now
+        if wait_time > 0:
+            print(f"\n⏳ Waiting {wait_time:.1f}s before next generation...")
+            time.sleep(wait_time)
+
+
 def auto_generate(
     count: int = 5,
     style: str = DEFAULT_STYLE,
     region: str = "US",
-    hf_token: Optional[str] = None
+    hf_token: Optional[str] = None,
+    fast_save: bool = False
 ) -> List[str]:
     """
     Automatically fetch trends and generate designs.
+    
+    Up to HF_CONCURRENCY generations run in parallel, with starts spaced
+    HF_MIN_INTERVAL apart. Post-processing (rembg + resize + save) runs in
+    a separate worker pool so it overlaps with pending HuggingFace requests.
     """
     print("\n" + "="*60)
     print("🚀 TrendMerch - Auto Generate Mode")
@@ -377,25 +538,47 @@ def auto_generate(
     for i, t in enumerate(trends, 1):
         print(f"   {i}. {t['query']}")
     
-    # Generate designs
+    # Generate designs (one client for the whole run)
+    client = _get_client(hf_token)
+    run_ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    pacer = _StartPacer(HF_MIN_INTERVAL)
     generated = []
-    for i, trend_data in enumerate(trends, 1):
-        trend = trend_data['query']
-        print(f"\n{'='*60}")
-        print(f"📹 Generating design {i}/{len(trends)}")
+    
+    with ThreadPoolExecutor(max_workers=2) as post_pool, \
+            ThreadPoolExecutor(max_workers=max(1, HF_CONCURRENCY)) as gen_pool:
         
-        try:
-            output = process_trend(trend, style, hf_token=hf_token)
-            if output:
-                generated.append(output)
-        except Exception as e:
-            print(f"❌ Error: {e}")
-            continue
+        def generate_one(i: int, trend: str):
+            """Generate one design and hand it to the post-processing pool."""
+            pacer.wait()
+            print(f"\n{'='*60}")
+            print(f"📹 Generating design {i}/{len(trends)}")
+            
+            try:
+                image = _generate_for_trend(trend, style, hf_token=hf_token, client=client)
+            except Exception as e:
+                print(f"❌ Error: {e}")
+                return None
+            
+            if image is None:
+                return None
+            return post_pool.submit(
+                _postprocess, image, trend,
+                fast_save=fast_save, timestamp=run_ts, index=i
+            )
+        
+        pending = [
+            gen_pool.submit(generate_one, i, trend_data['query'])
+            for i, trend_data in enumerate(trends, 1)
+        ]
         
-        # Rate limiting between generations
-        if i < len(trends):
-            print("\n⏳ Waiting 10s before next generation...")
-            time.sleep(10)
+        # Collect post-processed designs (in trend order)
+        for gen_future in pending:
+            try:
+                post_future = gen_future.result()
+                if post_future is not None:
+                    generated.append(post_future.result())
+            except Exception as e:
+                print(f"❌ Error: {e}")
     
     # Summary
     print("\n" + "="*60)
@@ -454,6 +637,8 @@ Available Styles:
                        help="Skip background removal")
     parser.add_argument("--no-resize", action="store_true",
                        help="Skip resizing for print")
+    parser.add_argument("--fast-save", action="store_true",
+                       help="Faster PNG encoding (larger files)")
     parser.add_argument("--list-styles", action="store_true",
                        help="List available style presets")
     parser.add_argument("--upload", "-u", action="store_true",
@@ -488,7 +673,8 @@ Available Styles:
             count=args.count,
             style=args.style,
             region=args.region,
-            hf_token=hf_token
+            hf_token=hf_token,
+            fast_save=args.fast_save
         )
     elif args.text:
         result = process_trend(
@@ -496,7 +682,8 @@ Available Styles:
             style=args.style,
             remove_bg=not args.no_bg_remove,
             resize=not args.no_resize,
-            hf_token=hf_token
+            hf_token=hf_token,
+            fast_save=args.fast_save
         )
         if result:
             generated = [result]
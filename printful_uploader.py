@@ -8,6 +8,7 @@ Requirements:
 2. Connect a store (Etsy, Shopify, etc.) in Printful dashboard
 3. Get API key from: https://www.printful.com/dashboard/developer/oauth-apps
 4. Set PRINTFUL_API_KEY environment variable
+5. (Optional) Set PRINTFUL_STORE_ID to skip the store lookup
 
 Printful Free Tier:
 - No monthly fees (pay per order only)
@@ -19,11 +20,106 @@ Printful Free Tier:
 import os
 import json
 import base64
+import logging
+import hashlib
+import random
+import time
+from itertools import islice
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Dict, List, Optional
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
+# Faster JSON encoding/decoding (optional)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+# Max designs processed in parallel (keeps Printful from rate-limiting us)
+PRINTFUL_MAX_CONCURRENCY = int(os.environ.get("PRINTFUL_MAX_CONCURRENCY", "8"))
+
+# Retry policy for transient Printful errors (rate limits and 5xx)
+MAX_ATTEMPTS = 5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Send design files base64-encoded in JSON instead of multipart
+# (for accounts whose /files endpoint only accepts the JSON variant)
+PRINTFUL_BASE64_UPLOAD = os.environ.get("PRINTFUL_BASE64_UPLOAD") == "1"
+
+# Print area placement shared by every product/mockup file
+_DEFAULT_POSITION = {
+    "area_width": 1800,
+    "area_height": 2400,
+    "width": 1800,
+    "height": 2400,
+    "top": 0,
+    "left": 0
+}
+
+# Read size for streaming base64 encoding (multiple of 3 so chunks encode without padding)
+B64_CHUNK_SIZE = 57 * 1024
+
+
+def _json_dumps(data) -> bytes:
+    """Serialize a request body to JSON bytes."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data)
+    return json.dumps(data).encode("utf-8")
+
+
+def _json_loads(content: bytes):
+    """Parse a JSON response body."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def _retry_delay(response: requests.Response, attempt: int) -> float:
+    """Seconds to wait before retrying: Retry-After if given, else backoff with jitter."""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+    return min(2 ** attempt + random.random(), 60)
+
+
+def _iter_file_chunks(file_path: str):
+    """
+    Yield a file in B64_CHUNK_SIZE pieces, reusing one read buffer.
+    Each yielded view is only valid until the next iteration.
+    """
+    buffer = bytearray(B64_CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(file_path, "rb") as f:
+        while size := f.readinto(buffer):
+            yield view[:size]
+
+
+def _b64encode_file(file_path: str) -> str:
+    """Base64-encode a file chunk by chunk instead of reading it whole."""
+    encoded = bytearray()
+    for chunk in _iter_file_chunks(file_path):
+        encoded += base64.b64encode(chunk)
+    return encoded.decode("ascii")
+
+
+def _sha256_file(file_path: str) -> str:
+    """SHA-256 of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    for chunk in _iter_file_chunks(file_path):
+        digest.update(chunk)
+    return digest.hexdigest()
+
 
 class PrintfulUploader:
     """
@@ -52,66 +148,141 @@ class PrintfulUploader:
         }
     }
     
-    def __init__(self, api_key: str = None):
+    # Variant IDs used per product type (first 8), computed once at import
+    _VARIANT_TEMPLATES = {
+        product_type: tuple(islice(variants.values(), 8))
+        for product_type, variants in VARIANTS.items()
+    }
+    
+    def __init__(self, api_key: str = None, store_id: int = None):
         self.api_key = api_key or os.environ.get("PRINTFUL_API_KEY")
         if not self.api_key:
             raise ValueError("PRINTFUL_API_KEY not found. Get it from https://www.printful.com/dashboard/developer/oauth-apps")
         
-        self.headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        # One pooled, keep-alive session for every API call
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {self.api_key}"
+        # Adapter retries cover connection errors; _request retries 429/5xx.
+        # Only api.printful.com is used, so one host pool sized to the worker
+        # count keeps every worker's connection alive instead of reconnecting.
+        self.session.mount("https://", HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=max(1, PRINTFUL_MAX_CONCURRENCY),
+            max_retries=Retry(total=3, backoff_factor=0.5),
+        ))
+        self.headers = self.session.headers
+        
+        # Store to create products in (optional if only one store is connected)
+        self.store_id = None
+        self._stores = None
+        store_id = store_id or os.environ.get("PRINTFUL_STORE_ID")
+        if store_id:
+            self.set_store(int(store_id))
+        
+        # Uploaded file info keyed by content hash (each PNG is uploaded once)
+        self._file_cache: Dict[str, dict] = {}
     
-    def _request(self, method: str, endpoint: str, data: dict = None) -> dict:
-        """Make API request to Printful."""
+    def _request(self, method: str, endpoint: str, data: dict = None,
+                 extra_headers: Optional[dict] = None,
+                 files: Optional[dict] = None) -> dict:
+        """
+        Make API request to Printful.
+        data is sent as JSON, or as form fields when files are given (multipart).
+        extra_headers apply to this request only (merged over the session headers).
+        """
         url = f"{self.BASE_URL}{endpoint}"
+        headers = dict(extra_headers or {})
         
-        try:
-            if method.upper() == "GET":
-                response = requests.get(url, headers=self.headers)
-            elif method.upper() == "POST":
-                response = requests.post(url, headers=self.headers, json=data)
-            elif method.upper() == "PUT":
-                response = requests.put(url, headers=self.headers, json=data)
-            else:
-                raise ValueError(f"Unknown method: {method}")
+        if files is not None:
+            # Multipart: requests builds the body and its Content-Type
+            body = data
+        elif data is not None:
+            body = _json_dumps(data)
+            headers["Content-Type"] = "application/json"
+        else:
+            body = None
+        
+        for attempt in range(MAX_ATTEMPTS):
+            # Multipart file bodies must be re-read from the start on each attempt
+            for value in (files or {}).values():
+                fileobj = value[1] if isinstance(value, tuple) else value
+                fileobj.seek(0)
             
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Printful API error: {e}")
-            if hasattr(e, 'response') and e.response:
-                print(f"   Response: {e.response.text}")
-            raise
+            try:
+                if method.upper() == "GET":
+                    response = self.session.get(url, headers=headers)
+                elif method.upper() == "POST":
+                    response = self.session.post(url, data=body, files=files, headers=headers)
+                elif method.upper() == "PUT":
+                    response = self.session.put(url, data=body, headers=headers)
+                else:
+                    raise ValueError(f"Unknown method: {method}")
+                
+                if response.status_code in RETRY_STATUSES and attempt < MAX_ATTEMPTS - 1:
+                    delay = _retry_delay(response, attempt)
+                    logger.warning("⚠️ Printful API returned %s, retrying in %.1fs (attempt %d/%d)",
+                                   response.status_code, delay, attempt + 1, MAX_ATTEMPTS)
+                    time.sleep(delay)
+                    continue
+                
+                response.raise_for_status()
+                return _json_loads(response.content)
+            except requests.exceptions.RequestException as e:
+                logger.error("❌ Printful API error: %s", e)
+                if hasattr(e, 'response') and e.response:
+                    logger.error("   Response: %s", e.response.text)
+                raise
+    
+    def get_stores(self, refresh: bool = False) -> List[dict]:
+        """Get connected stores (cached per uploader)."""
+        if self._stores is None or refresh:
+            result = self._request("GET", "/stores")
+            self._stores = result.get("result", [])
+        return self._stores
     
-    def get_stores(self) -> List[dict]:
-        """Get connected stores."""
-        result = self._request("GET", "/stores")
-        return result.get("result", [])
+    def set_store(self, store_id: int):
+        """
+        Send all following requests to the given store.
+        Call before sharing the uploader across threads; per-call overrides
+        go through create_product(store_id=...).
+        """
+        self.store_id = store_id
+        self.headers["X-PF-Store-Id"] = str(store_id)
     
     def upload_file(self, file_path: str) -> dict:
         """
         Upload a design file to Printful's file library.
-        Returns file info with URL.
+        Returns file info with URL. Files with identical contents are
+        only uploaded once per uploader.
         """
-        print(f"📤 Uploading to Printful: {file_path}")
+        digest = _sha256_file(file_path)
+        if digest in self._file_cache:
+            return self._file_cache[digest]
         
-        # Read and encode file
-        with open(file_path, "rb") as f:
-            file_data = base64.b64encode(f.read()).decode()
+        logger.debug("📤 Uploading to Printful: %s", file_path)
         
         filename = Path(file_path).name
         
-        data = {
-            "type": "default",
-            "filename": filename,
-            "contents": file_data
-        }
+        if PRINTFUL_BASE64_UPLOAD:
+            # Legacy JSON upload with base64-encoded contents
+            data = {
+                "type": "default",
+                "filename": filename,
+                "contents": _b64encode_file(file_path)
+            }
+            result = self._request("POST", "/files", data)
+        else:
+            # Raw bytes as multipart form data (no base64 overhead)
+            with open(file_path, "rb") as f:
+                result = self._request(
+                    "POST", "/files", {"type": "default"},
+                    files={"file": (filename, f, "image/png")}
+                )
         
-        result = self._request("POST", "/files", data)
         file_info = result.get("result", {})
+        self._file_cache[digest] = file_info
         
-        print(f"   ✅ Uploaded! File ID: {file_info.get('id')}")
+        logger.debug("   ✅ Uploaded! File ID: %s", file_info.get('id'))
         return file_info
     
     def create_product(self, 
@@ -135,10 +306,37 @@ class PrintfulUploader:
         Returns:
             Product info from Printful
         """
-        print(f"\n🛍️ Creating product: {title}")
-        
         # Upload design file
         file_info = self.upload_file(design_file)
+        
+        return self.create_product_from_file(
+            file_info,
+            title,
+            description=description,
+            product_type=product_type,
+            store_id=store_id,
+            price=price
+        )
+    
+    def create_product_from_file(self,
+                                 file_info: dict,
+                                 title: str,
+                                 description: str = None,
+                                 product_type: str = "unisex_tshirt",
+                                 store_id: int = None,
+                                 price: float = 24.99) -> dict:
+        """
+        Create a product from a file already in Printful's library.
+        
+        Args:
+            file_info: File info returned by upload_file()
+            (other args as in create_product)
+        
+        Returns:
+            Product info from Printful
+        """
+        logger.debug("🛍️ Creating product: %s", title)
+        
         file_url = file_info.get("preview_url") or file_info.get("url")
         file_id = file_info.get("id")
         
@@ -147,29 +345,8 @@ class PrintfulUploader:
         
         # Get product and variant info
         product_id = self.PRODUCTS.get(product_type, self.PRODUCTS["unisex_tshirt"])
-        variants = self.VARIANTS.get(product_type, self.VARIANTS["unisex_tshirt"])
-        
-        # Build sync variants (different sizes/colors)
-        sync_variants = []
-        for variant_name, variant_id in list(variants.items())[:8]:  # Limit to 8 variants
-            sync_variants.append({
-                "variant_id": variant_id,
-                "files": [
-                    {
-                        "type": "front",
-                        "id": file_id,
-                        "position": {
-                            "area_width": 1800,
-                            "area_height": 2400,
-                            "width": 1800,
-                            "height": 2400,
-                            "top": 0,
-                            "left": 0
-                        }
-                    }
-                ],
-                "retail_price": str(price)
-            })
+        
+        sync_variants = self._build_sync_variants(product_type, file_id, price)
         
         # Create product data
         product_data = {
@@ -180,26 +357,35 @@ class PrintfulUploader:
             "sync_variants": sync_variants
         }
         
-        # Add store ID if specified
+        # Target a specific store for this request only (shared headers stay untouched)
         endpoint = f"/store/products"
-        if store_id:
-            self.headers["X-PF-Store-Id"] = str(store_id)
+        extra_headers = {"X-PF-Store-Id": str(store_id)} if store_id else None
         
-        result = self._request("POST", endpoint, product_data)
+        result = self._request("POST", endpoint, product_data, extra_headers=extra_headers)
         product_info = result.get("result", {})
         
-        print(f"   ✅ Product created!")
-        print(f"   📦 ID: {product_info.get('sync_product', {}).get('id')}")
-        print(f"   🔗 External ID: {product_info.get('sync_product', {}).get('external_id')}")
+        sync_product = product_info.get('sync_product', {})
+        logger.debug("   ✅ Product created! ID: %s, External ID: %s",
+                     sync_product.get('id'), sync_product.get('external_id'))
         
         return product_info
     
+    def _build_sync_variants(self, product_type: str, file_id: int, price: float) -> List[dict]:
+        """Build sync variants (different sizes/colors, limit to 8) for a product type."""
+        variant_ids = self._VARIANT_TEMPLATES.get(product_type, self._VARIANT_TEMPLATES["unisex_tshirt"])
+        files = [{"type": "front", "id": file_id, "position": _DEFAULT_POSITION}]
+        retail_price = str(price)
+        return [
+            {"variant_id": variant_id, "files": files, "retail_price": retail_price}
+            for variant_id in variant_ids
+        ]
+    
     def create_mockup(self, design_file: str, product_type: str = "unisex_tshirt") -> str:
         """
         Generate a product mockup image.
         Returns URL to mockup image.
         """
-        print(f"📸 Generating mockup...")
+        logger.debug("📸 Generating mockup...")
         
         # Upload design
         file_info = self.upload_file(design_file)
@@ -214,14 +400,7 @@ class PrintfulUploader:
                 {
                     "placement": "front",
                     "image_url": file_url,
-                    "position": {
-                        "area_width": 1800,
-                        "area_height": 2400,
-                        "width": 1800,
-                        "height": 2400,
-                        "top": 0,
-                        "left": 0
-                    }
+                    "position": _DEFAULT_POSITION
                 }
             ]
         }
@@ -232,81 +411,148 @@ class PrintfulUploader:
         if not task_key:
             raise ValueError("Failed to create mockup task")
         
-        # Poll for result
-        import time
-        for _ in range(30):
-            time.sleep(2)
-            status = self._request("GET", f"/mockup-generator/task?task_key={task_key}")
-            task_status = status.get("result", {}).get("status")
+        # Wait for result
+        task = self.wait_for_mockups([task_key])[task_key]
+        if task.get("status") == "failed":
+            raise ValueError("Mockup generation failed")
+        
+        mockups = task.get("mockups", [])
+        if not mockups:
+            raise ValueError("Mockup generation returned no mockups")
+        
+        mockup_url = mockups[0].get("mockup_url")
+        logger.debug("   ✅ Mockup ready: %s", mockup_url)
+        return mockup_url
+    
+    def wait_for_mockups(self, task_keys: List[str], timeout: float = 60) -> Dict[str, dict]:
+        """
+        Poll mockup tasks until they finish.
+        All pending tasks are checked with one request per tick; the poll
+        interval starts at 0.5s and doubles (jittered) up to 5s.
+        
+        Returns:
+            Dict of task_key -> task result (status 'completed' or 'failed')
+        """
+        pending = set(task_keys)
+        finished = {}
+        delay = 0.5
+        deadline = time.monotonic() + timeout
+        
+        while pending:
+            if time.monotonic() >= deadline:
+                raise TimeoutError("Mockup generation timed out")
+            time.sleep(delay * random.uniform(0.8, 1.2))
+            delay = min(delay * 2, 5)
+            
+            keys = ",".join(sorted(pending))
+            status = self._request("GET", f"/mockup-generator/task?task_key={keys}")
+            tasks = status.get("result", [])
+            if isinstance(tasks, dict):
+                tasks = [tasks]
             
-            if task_status == "completed":
-                mockups = status.get("result", {}).get("mockups", [])
-                if mockups:
-                    mockup_url = mockups[0].get("mockup_url")
-                    print(f"   ✅ Mockup ready: {mockup_url}")
-                    return mockup_url
-            elif task_status == "failed":
-                raise ValueError("Mockup generation failed")
+            for task in tasks:
+                key = task.get("task_key")
+                if key is None and len(pending) == 1:
+                    key = next(iter(pending))
+                if key in pending and task.get("status") in ("completed", "failed"):
+                    pending.discard(key)
+                    finished[key] = task
         
-        raise TimeoutError("Mockup generation timed out")
+        return finished
 
 
 def upload_designs_to_printful(design_paths: List[str], 
-                                base_price: float = 24.99) -> List[dict]:
+                                base_price: float = 24.99,
+                                store_id: Optional[int] = None) -> List[dict]:
     """
     Batch upload designs and create products.
     
     Args:
         design_paths: List of paths to PNG files
         base_price: Retail price for products
+        store_id: Printful store ID (or use PRINTFUL_STORE_ID env var;
+                  defaults to the first connected store)
     
     Returns:
         List of created product info
     """
     try:
-        uploader = PrintfulUploader()
+        uploader = PrintfulUploader(store_id=store_id)
     except ValueError as e:
-        print(f"⚠️ {e}")
-        print("   Skipping Printful upload. Designs saved locally.")
+        logger.warning("⚠️ %s", e)
+        logger.warning("   Skipping Printful upload. Designs saved locally.")
         return []
     
-    # Get stores
-    stores = uploader.get_stores()
-    if not stores:
-        print("⚠️ No stores connected to Printful!")
-        print("   Connect a store at: https://www.printful.com/dashboard/store")
-        return []
+    # Resolve store (skips the /stores call when the ID is already known)
+    if uploader.store_id:
+        logger.info("📦 Using store ID: %s", uploader.store_id)
+    else:
+        stores = uploader.get_stores()
+        if not stores:
+            logger.warning("⚠️ No stores connected to Printful!")
+            logger.warning("   Connect a store at: https://www.printful.com/dashboard/store")
+            return []
+        
+        logger.info("📦 Using store: %s", stores[0].get('name'))
+        uploader.set_store(stores[0].get("id"))
     
-    print(f"📦 Using store: {stores[0].get('name')}")
-    store_id = stores[0].get("id")
+    def product_details(design_path: str):
+        # Generate title from filename
+        filename = Path(design_path).stem
+        title = filename.replace("_", " ").title()
+        
+        # Add timestamp suffix to make unique
+        timestamp = datetime.now().strftime("%m%d")
+        title = f"{title} {timestamp}"
+        
+        description = f"Trending design: {title}. High-quality print on soft, comfortable fabric."
+        return title, description
     
-    products = []
-    for design_path in design_paths:
+    # Warm up the connection pool with one cheap call before fanning out, so
+    # workers reuse a live connection instead of racing to open the first one
+    # (no extra request when the stores were just fetched above)
+    if len(design_paths) > 1:
         try:
-            # Generate title from filename
-            filename = Path(design_path).stem
-            title = filename.replace("_", " ").title()
-            
-            # Add timestamp suffix to make unique
-            timestamp = datetime.now().strftime("%m%d")
-            title = f"{title} {timestamp}"
-            
-            description = f"Trending design: {title}. High-quality print on soft, comfortable fabric."
+            uploader.get_stores()
+        except requests.exceptions.RequestException:
+            pass
+    
+    # Upload files concurrently and create each product as soon as its
+    # upload finishes, so product creation overlaps the remaining uploads
+    product_futures = []
+    with ThreadPoolExecutor(max_workers=max(1, PRINTFUL_MAX_CONCURRENCY)) as pool:
+        upload_futures = {
+            pool.submit(uploader.upload_file, path): (i, path)
+            for i, path in enumerate(design_paths)
+        }
+        for future in as_completed(upload_futures):
+            i, design_path = upload_futures[future]
+            try:
+                file_info = future.result()
+            except Exception as e:
+                logger.error("❌ Failed to upload %s: %s", design_path, e)
+                continue
             
-            product = uploader.create_product(
-                design_file=design_path,
-                title=title,
+            title, description = product_details(design_path)
+            product_futures.append((i, design_path, pool.submit(
+                uploader.create_product_from_file,
+                file_info,
+                title,
                 description=description,
-                store_id=store_id,
                 price=base_price
-            )
-            products.append(product)
-            
-        except Exception as e:
-            print(f"❌ Failed to create product for {design_path}: {e}")
-            continue
+            )))
+        
+        # Collect in input order
+        products = []
+        for _, design_path, future in sorted(product_futures, key=lambda item: item[0]):
+            try:
+                products.append(future.result())
+            except Exception as e:
+                logger.error("❌ Failed to create product for %s: %s", design_path, e)
     
-    print(f"\n✅ Created {len(products)} products on Printful!")
+    # One summary line for the whole batch
+    product_ids = [str(p.get('sync_product', {}).get('id')) for p in products]
+    logger.info("✅ Created %d products on Printful: %s", len(products), ", ".join(product_ids))
     return products
 
 
@@ -318,8 +564,11 @@ if __name__ == "__main__":
         print("Usage: python printful_uploader.py <design.png>")
         print("\nEnvironment variables needed:")
         print("  PRINTFUL_API_KEY - Your Printful API key")
+        print("  PRINTFUL_STORE_ID - Store ID (optional, defaults to first store)")
         sys.exit(1)
     
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    
     design_file = sys.argv[1]
     results = upload_designs_to_printful([design_file])
     print(json.dumps(results, indent=2))